@@ -0,0 +1,122 @@
+import cv2
+import numpy as np
+from ultralytics import YOLO
+from ppe_compliance import PERSON
+
+# Two-stage cascade for CPU / low-power targets:
+#   1. A small person detector runs on the whole frame at low resolution (tracked, so IDs persist).
+#   2. Only person crops, closest-to-danger first, are batched through a compact PPE model
+#      at higher resolution (trained by vision_core/train_cascade.py on the data.yaml classes).
+# Output rows use the same layout as result.boxes.data in inference_loop.py, so the
+# compliance, zone and alert logic downstream don't know which path produced them.
+
+COCO_PERSON = 0
+
+
+class CascadeDetector:
+    def __init__(self, ppe_model_path, person_model_path='yolov8n.pt',
+                 person_imgsz=320, ppe_imgsz=256, max_crops=8, crop_pad=0.15,
+                 person_class=COCO_PERSON, conf=0.25, zones=None):
+        """
+        Args:
+            ppe_model_path: Stage 2 model with the data.yaml classes, ideally trained on person crops
+                            (vision_core/train_cascade.py). Must not be a COCO checkpoint.
+            person_model_path: Small detector for stage 1 (COCO weights work out of the box).
+            person_imgsz (int): Stage 1 input size, kept low since persons are large.
+            ppe_imgsz (int): Stage 2 input size per crop.
+            max_crops (int): Max persons sent to stage 2 per frame (the rest keep their person box only).
+            crop_pad (float): Crop padding as a fraction of the person box, so helmets aren't cut off.
+            person_class (int): Person class ID in the stage 1 model.
+            zones (list of PolygonZone): Crops are prioritised by proximity to these.
+        """
+        self.person_model = YOLO(person_model_path)
+        self.ppe_model = YOLO(ppe_model_path)
+        self.person_imgsz = person_imgsz
+        self.ppe_imgsz = ppe_imgsz
+        self.max_crops = max_crops
+        self.crop_pad = crop_pad
+        self.person_class = person_class
+        self.conf = conf
+        self.zones = zones or []
+
+    def warmup(self):
+        self.person_model.predict(np.zeros((self.person_imgsz, self.person_imgsz, 3), np.uint8),
+                                  verbose=False, imgsz=self.person_imgsz)
+        self.ppe_model.predict([np.zeros((self.ppe_imgsz, self.ppe_imgsz, 3), np.uint8)] * self.max_crops,
+                               verbose=False, imgsz=self.ppe_imgsz)
+
+    def priority(self, persons):
+        """
+        Signed distance (px) from each person's feet to the nearest zone:
+        positive inside, negative outside. Higher = more urgent.
+        """
+        if not self.zones:
+            return np.zeros(len(persons))
+        scores = []
+        for x1, y1, x2, y2 in persons[:, :4]:
+            foot = (float((x1 + x2) / 2), float(y2))
+            scores.append(max(cv2.pointPolygonTest(z.polygon, foot, True) for z in self.zones))
+        return np.array(scores)
+
+    def detect(self, frame):
+        """
+        Returns:
+            list: Rows [x1, y1, x2, y2, track_id, conf, cls] for persons and
+                  [x1, y1, x2, y2, conf, cls] for PPE items, in data.yaml class IDs.
+        """
+        h, w = frame.shape[:2]
+
+        # Stage 1: persons only, low resolution, tracked
+        result = self.person_model.track(frame, verbose=False, conf=self.conf, imgsz=self.person_imgsz,
+                                         classes=[self.person_class], persist=True, tracker="bytetrack.yaml")[0]
+        data = result.boxes.data.cpu().numpy()
+        if len(data) == 0:
+            return []
+
+        rows = []
+        for det in data:
+            if len(det) == 7:
+                x1, y1, x2, y2, track_id, conf, _ = det
+            else:
+                x1, y1, x2, y2, conf, _ = det
+                track_id = -1
+            rows.append([x1, y1, x2, y2, track_id, conf, PERSON])
+
+        # Stage 2: padded crops of the most urgent persons, one batched call
+        order = np.argsort(-self.priority(data))[:self.max_crops]
+        crops, offsets = [], []
+        for i in order:
+            x1, y1, x2, y2 = data[i, :4]
+            px, py = (x2 - x1) * self.crop_pad, (y2 - y1) * self.crop_pad
+            cx1, cy1 = int(max(0, x1 - px)), int(max(0, y1 - py))
+            cx2, cy2 = int(min(w, x2 + px)), int(min(h, y2 + py))
+            if cx2 - cx1 < 8 or cy2 - cy1 < 8:
+                continue
+            crops.append(frame[cy1:cy2, cx1:cx2])
+            offsets.append((cx1, cy1))
+        if not crops:
+            return rows
+
+        items = []
+        for crop_result, (ox, oy) in zip(self.ppe_model.predict(crops, verbose=False, conf=self.conf,
+                                                                 imgsz=self.ppe_imgsz), offsets):
+            for x1, y1, x2, y2, conf, cls in crop_result.boxes.data.cpu().numpy():
+                if int(cls) == PERSON:
+                    continue  # Stage 1 owns persons
+                items.append([x1 + ox, y1 + oy, x2 + ox, y2 + oy, conf, cls])
+
+        return rows + self._dedupe(items)
+
+    @staticmethod
+    def _dedupe(items, iou=0.5):
+        """ Crops of neighbouring workers overlap, so the same helmet can come back twice. """
+        if len(items) < 2:
+            return items
+        items = np.array(items, np.float32)
+        keep = []
+        for cls in np.unique(items[:, 5]):
+            idx = np.flatnonzero(items[:, 5] == cls)
+            xywh = [[float(x1), float(y1), float(x2 - x1), float(y2 - y1)] for x1, y1, x2, y2 in items[idx, :4]]
+            kept = cv2.dnn.NMSBoxes(xywh, items[idx, 4].tolist(), 0.0, iou)
+            keep.extend(idx[np.array(kept, dtype=int).reshape(-1)])
+        return items[sorted(keep)].tolist()
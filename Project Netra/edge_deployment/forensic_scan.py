@@ -0,0 +1,368 @@
+import argparse
+import csv
+import json
+import multiprocessing as mp
+import os
+import queue
+import time
+
+import cv2
+import numpy as np
+
+# Offline counterpart of inference_loop.py: scans archived footage for intrusions
+# and PPE violations as fast as the hardware allows (no real-time pacing).
+#
+# Each video is split into fixed-length time segments. A pool of decode workers (OpenCV only)
+# reads segments in parallel, samples every Nth frame, downsizes it to the model input size and
+# puts it on a bounded queue. The parent process owns the single model and runs batched
+# inference over frames from any segment, so there is one model / one CUDA context in total.
+#
+# Outputs mirror the input tree: 'cam1/day.mp4' gets '<out>/cam1/day.mp4/seg_XXXXX.csv' while
+# in progress (so an interrupted scan resumes where it stopped) and '<out>/cam1/day.mp4.events.csv'
+# once all of its segments are done. A per-video manifest.json records the settings the segments
+# were produced with; segments from a run with other settings are discarded, not resumed.
+
+VIDEO_EXTS = (".mp4", ".avi", ".mkv", ".mov", ".m4v", ".ts")
+EVENT_FIELDS = ["start_s", "end_s", "event", "detail", "max_count"]
+
+# Per-decoder state, set up once by _init_decoder
+_decoder = {}
+
+
+def find_videos(video_dir):
+    paths = []
+    for root, _, files in os.walk(video_dir):
+        # DVR exports often use upper-case extensions (.MP4, .AVI)
+        paths.extend(os.path.join(root, f) for f in files if f.lower().endswith(VIDEO_EXTS))
+    return sorted(paths)
+
+
+def probe_video(path):
+    """
+    Returns (fps, frame_count) or None if the file can't be opened.
+    frame_count is the container's estimate and may be 0 (e.g. some .ts/.mkv files).
+    """
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        return None
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return fps, frame_count
+
+
+def plan_segments(path, out_base, fps, frame_count, segment_s):
+    """
+    Splits a video into (path, out_base, seg_idx, start_frame, end_frame, fps) jobs.
+    The last segment has end_frame=None and reads to EOF, since the frame count is only an
+    estimate; without a usable count the whole file is one sequential segment.
+    """
+    if frame_count <= 0:
+        return [(path, out_base, 0, 0, None, fps)]
+    seg_len = max(1, int(round(segment_s * fps)))
+    starts = list(range(0, frame_count, seg_len))
+    return [(path, out_base, i, start, start + seg_len if i < len(starts) - 1 else None, fps)
+            for i, start in enumerate(starts)]
+
+
+def output_base(out_dir, video_dir, path):
+    # Keep sub-directories and extension so cam1/a.mp4, cam2/a.mp4 and a.avi never collide
+    return os.path.join(out_dir, os.path.relpath(path, video_dir))
+
+
+def segment_file(out_base, seg_idx):
+    return os.path.join(out_base, f"seg_{seg_idx:05d}.csv")
+
+
+def check_manifest(out_base, settings):
+    """
+    Makes sure the segments already in `out_base` were produced with `settings`
+    (segment length, stride, fps, frame count, model...). Otherwise their frame ranges or
+    detections don't match this run, so they are deleted and the video is rescanned.
+    Returns the number of discarded segment files.
+    """
+    path = os.path.join(out_base, "manifest.json")
+    previous = None
+    if os.path.exists(path):
+        with open(path) as f:
+            previous = json.load(f)
+    if previous == settings:
+        return 0
+
+    stale = [f for f in os.listdir(out_base) if f.startswith("seg_") and f.endswith(".csv")]
+    for f in stale:
+        os.remove(os.path.join(out_base, f))
+    if os.path.exists(out_base + ".events.csv"):
+        os.remove(out_base + ".events.csv")
+
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(settings, f, indent=2)
+    os.replace(tmp, path)
+    return len(stale)
+
+
+def _init_decoder(frame_queue, stride, imgsz):
+    # Decoders never import torch; parallelism comes from the pool, not from OpenCV threads
+    cv2.setNumThreads(1)
+    _decoder.update(queue=frame_queue, stride=stride, imgsz=imgsz)
+
+
+def decode_segment(job):
+    """
+    Decodes one segment in a worker process and streams sampled frames to the parent as
+    ("frame", key, t, frame, scale) messages, followed by ("done", key, frames_read).
+    """
+    path, out_base, seg_idx, start, end, fps = job
+    d = _decoder
+    key = (out_base, seg_idx)
+
+    cap = cv2.VideoCapture(path)
+    if start:
+        # NOTE: Seeking lands on the nearest keyframe for some codecs, good enough for incident review
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+
+    idx = start
+    while end is None or idx < end:
+        # grab() skips the BGR conversion for frames we don't sample
+        if not cap.grab():
+            break
+        if (idx - start) % d["stride"] == 0:
+            ok, frame = cap.retrieve()
+            if not ok:
+                break
+            # Shrink before crossing the process boundary; boxes are scaled back by the parent
+            scale = min(1.0, d["imgsz"] / max(frame.shape[:2]))
+            if scale < 1.0:
+                frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            d["queue"].put(("frame", key, idx / fps, frame, scale))
+        idx += 1
+    cap.release()
+
+    d["queue"].put(("done", key, idx - start))
+
+
+class EventCollapser:
+    """
+    Turns per-frame hits into [start, end] intervals so one incident
+    is one row, not one row per sampled frame.
+    """
+    def __init__(self, gap_s):
+        self.gap_s = gap_s
+        self.open = {}  # (event, detail) -> row
+        self.rows = []
+
+    def hit(self, t, event, detail, count=1):
+        row = self.open.get((event, detail))
+        if row and t - row["end_s"] <= self.gap_s:
+            row["end_s"] = t
+            row["max_count"] = max(row["max_count"], count)
+            return
+        if row:
+            self.rows.append(row)
+        self.open[(event, detail)] = {"start_s": t, "end_s": t, "event": event,
+                                      "detail": detail, "max_count": count}
+
+    def close(self):
+        self.rows.extend(self.open.values())
+        self.open = {}
+        return sorted(self.rows, key=lambda r: r["start_s"])
+
+
+def _frame_events(result, t, scale, zone, compliance, events):
+    data = result.boxes.data.cpu().numpy()
+    if len(data) == 0:
+        return
+    data[:, :4] /= scale  # Back to original pixel coordinates, where the zone is defined
+    boxes, classes = data[:, :4], data[:, -1].astype(int)
+
+    intruders = zone.trigger(data.tolist())
+    if intruders:
+        events.hit(t, "INTRUSION", zone.name, len(intruders))
+
+    # No tracker offline: judge PPE per frame, interval collapsing does the smoothing
+    workers = compliance.update(boxes, classes, np.full(len(data), -1))
+    for item in ("helmet", "vest"):
+        missing = sum(1 for w in workers if item in w["violations"])
+        if missing:
+            events.hit(t, "PPE_VIOLATION", f"no {item}", missing)
+
+
+def write_rows(path, rows):
+    # Write-then-rename so a killed scan never leaves a half-written segment behind
+    tmp = path + ".tmp"
+    with open(tmp, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=EVENT_FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({**row, "start_s": f"{row['start_s']:.2f}", "end_s": f"{row['end_s']:.2f}"})
+    os.replace(tmp, path)
+
+
+def merge_segments(out_base, n_segments):
+    rows = []
+    for seg_idx in range(n_segments):
+        with open(segment_file(out_base, seg_idx), newline="") as f:
+            rows.extend(csv.DictReader(f))
+    rows.sort(key=lambda r: float(r["start_s"]))
+    table = out_base + ".events.csv"
+    write_rows(table, [{**r, "start_s": float(r["start_s"]), "end_s": float(r["end_s"])} for r in rows])
+    return table, len(rows)
+
+
+def run_scan(video_dir, out_dir, model_path, segment_s=300, stride=5, batch=16,
+             workers=None, imgsz=640, conf=0.25, device=None, queue_size=None):
+    """
+    Scans every video under `video_dir` and writes one event table per file.
+    Args:
+        segment_s (float): Segment length in seconds (unit of parallelism and resume).
+        stride (int): Run inference on every Nth frame.
+        batch (int): Frames per inference call.
+        workers (int): Decode worker processes, defaults to min(4, CPU count - 1).
+        queue_size (int): Max decoded frames waiting for inference, defaults to 4 batches.
+    Returns:
+        dict: Throughput stats.
+    """
+    from ultralytics import YOLO
+    from polygon_zone import PolygonZone
+    from ppe_compliance import PPEComplianceMonitor
+    from inference_loop import DANGER_ZONE, DANGER_ZONE_NAME
+
+    os.makedirs(out_dir, exist_ok=True)
+    workers = workers or max(1, min(4, (os.cpu_count() or 2) - 1))
+
+    jobs, n_segments, skipped_s = [], {}, 0.0
+    for path in find_videos(video_dir):
+        info = probe_video(path)
+        if info is None:
+            print(f"⚠️  Could not open {path}, skipping.")
+            continue
+        fps, frame_count = info
+        if frame_count <= 0:
+            print(f"⚠️  No frame count for {path}, decoding it sequentially to EOF.")
+        out_base = output_base(out_dir, video_dir, path)
+        segments = plan_segments(path, out_base, fps, frame_count, segment_s)
+        n_segments[out_base] = len(segments)
+        os.makedirs(out_base, exist_ok=True)
+        settings = {"segment_s": segment_s, "stride": stride, "fps": fps, "frame_count": frame_count,
+                    "imgsz": imgsz, "conf": conf, "weights": model_path}
+        discarded = check_manifest(out_base, settings)
+        if discarded:
+            print(f"⚠️  {path}: {discarded} segment(s) came from a scan with other settings, rescanning.")
+        for job in segments:
+            if os.path.exists(segment_file(out_base, job[2])):
+                # Already done in a previous run (duration estimated from the frame count)
+                skipped_s += ((job[4] if job[4] is not None else max(frame_count, job[3])) - job[3]) / fps
+            else:
+                jobs.append(job)
+
+    print(f"🎞️  {len(n_segments)} video(s), {len(jobs)} segment(s) to scan "
+          f"({skipped_s / 3600:.2f} video-hours already done) on {workers} decode worker(s).")
+
+    remaining = {base: sum(1 for j in jobs if j[1] == base) for base in n_segments}
+    collapsers = {(j[1], j[2]): EventCollapser(gap_s=max(1.0, 2 * stride / j[5])) for j in jobs}
+    pending = {key: 0 for key in collapsers}  # frames received but not inferred yet
+    finished = {}  # key -> frames read, once the decoder is done with it
+    seg_fps = {(j[1], j[2]): j[5] for j in jobs}
+
+    model = YOLO(model_path)
+    zone = PolygonZone(DANGER_ZONE, DANGER_ZONE_NAME)
+    compliance = PPEComplianceMonitor()
+
+    t0 = time.time()
+    video_s, frames = 0.0, 0
+    batch_items = []
+
+    def flush():
+        nonlocal frames
+        if not batch_items:
+            return
+        results = model.predict([item[3] for item in batch_items], verbose=False, conf=conf,
+                                imgsz=imgsz, device=device)
+        for result, (_, key, t, _, scale) in zip(results, batch_items):
+            _frame_events(result, t, scale, zone, compliance, collapsers[key])
+            pending[key] -= 1
+        frames += len(batch_items)
+        batch_items.clear()
+
+    def finalize_ready():
+        nonlocal video_s
+        for key in [k for k in finished if pending[k] == 0]:
+            out_base, seg_idx = key
+            rows = collapsers.pop(key).close()
+            write_rows(segment_file(out_base, seg_idx), rows)
+            video_s += finished.pop(key) / seg_fps[key]
+            remaining[out_base] -= 1
+
+            elapsed = max(time.time() - t0, 1e-6)
+            print(f"  {os.path.relpath(out_base, out_dir)} seg {seg_idx}: {len(rows)} event(s) | "
+                  f"{video_s / elapsed:.1f}x real-time")
+
+            if remaining[out_base] == 0:
+                table, n_events = merge_segments(out_base, n_segments[out_base])
+                print(f"✅ {table}: {n_events} event(s)")
+
+    ctx = mp.get_context("spawn")
+    frame_queue = ctx.Queue(maxsize=queue_size or 4 * batch)
+    with ctx.Pool(workers, initializer=_init_decoder, initargs=(frame_queue, stride, imgsz)) as pool:
+        decoding = pool.map_async(decode_segment, jobs, chunksize=1)
+        last_msg = time.time()
+        while collapsers:
+            try:
+                msg = frame_queue.get(timeout=0.1)
+            except queue.Empty:
+                # Nothing new: don't sit on a partial batch, and surface decoder crashes
+                flush()
+                finalize_ready()
+                if decoding.ready() and not decoding.successful():
+                    decoding.get()  # Re-raises the decoder exception
+                # Queued messages can trail the task results briefly, give them time to arrive
+                if collapsers and decoding.ready() and time.time() - last_msg > 10:
+                    raise RuntimeError(f"{len(collapsers)} segment(s) never reported completion")
+                continue
+            last_msg = time.time()
+
+            if msg[0] == "frame":
+                pending[msg[1]] += 1
+                batch_items.append(msg)
+                if len(batch_items) == batch:
+                    flush()
+            else:
+                finished[msg[1]] = msg[2]
+            finalize_ready()
+
+    # Files that were fully scanned by an earlier run but never merged
+    for out_base, left in remaining.items():
+        if left == 0 and not os.path.exists(out_base + ".events.csv"):
+            merge_segments(out_base, n_segments[out_base])
+
+    elapsed = max(time.time() - t0, 1e-6)
+    stats = {
+        "video_hours": video_s / 3600,
+        "wall_hours": elapsed / 3600,
+        "video_hours_per_hour": video_s / elapsed,
+        "frames_inferred": frames,
+        "inference_fps": frames / elapsed,
+    }
+    print(f"\n📊 Scanned {stats['video_hours']:.2f} video-hours in {elapsed:.0f}s "
+          f"-> {stats['video_hours_per_hour']:.1f} video-hours per wall-clock hour "
+          f"({stats['inference_fps']:.1f} inferred frames/s)")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline forensic scan of archived footage")
+    parser.add_argument('video_dir', type=str, help='Directory of recorded video files')
+    parser.add_argument('--out', type=str, default='forensic_events', help='Output directory for event tables')
+    parser.add_argument('--weights', type=str, default='yolov8m.pt', help='Path to .pt or .engine file')
+    parser.add_argument('--segment', type=float, default=300, help='Segment length in seconds')
+    parser.add_argument('--stride', type=int, default=5, help='Run inference on every Nth frame')
+    parser.add_argument('--batch', type=int, default=16, help='Frames per inference batch')
+    parser.add_argument('--workers', type=int, default=None, help='Decode worker processes (default: min(4, CPUs - 1))')
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--conf', type=float, default=0.25)
+    parser.add_argument('--device', type=str, default=None, help="e.g. 'cpu', '0'")
+    args = parser.parse_args()
+
+    run_scan(args.video_dir, args.out, args.weights, segment_s=args.segment, stride=args.stride,
+             batch=args.batch, workers=args.workers, imgsz=args.imgsz, conf=args.conf, device=args.device)
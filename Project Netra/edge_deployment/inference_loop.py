@@ -3,6 +3,13 @@ import time
 from ultralytics import YOLO
 import numpy as np
 from polygon_zone import PolygonZone
+from ppe_compliance import PPEComplianceMonitor, PERSON, NO_HELMET, NO_VEST
+from occupancy_heatmap import OccupancyHeatmap
+
+# Define a Danger Zone (Interactive in real UI, hardcoded here)
+# Top-left, Top-right, Bottom-right, Bottom-left
+DANGER_ZONE = [(200, 200), (500, 200), (500, 400), (100, 400)]
+DANGER_ZONE_NAME = "High Voltage Area"
 
 # Mock Alert System
 def send_alert(alert_type, details):
@@ -10,23 +17,75 @@ def send_alert(alert_type, details):
     # Integration with Webhook/Sonic Alarm goes here
 
 class NetraInferenceLoop:
-    def __init__(self, source=0, model_path='yolov8m.pt'):
+    def __init__(self, source=0, model_path='yolov8m.pt', camera_id="cam0",
+                 cascade=False, person_model_path='yolov8n.pt',
+                 heatmap_half_life_s=300.0, heatmap_render_interval_s=1.0, heatmap_snapshot_interval_s=60.0):
         """
         Args:
             source: 0 for webcam, or RTSP string "rtsp://..."
             model_path: Path to .pt or .engine file
+            camera_id: Name used for per-camera analytics (heatmap snapshots)
+            cascade: Use the two-stage person -> PPE cascade (see cascade.py).
+                     model_path is then the stage 2 PPE model.
+            person_model_path: Stage 1 person detector, only used with cascade=True
+            heatmap_half_life_s: Time for an old occupancy hit to lose half its weight
+            heatmap_render_interval_s: Minimum time between two heatmap overlays
+            heatmap_snapshot_interval_s: Time between two heatmap snapshots on disk
         """
         print(f"Initing Netra Inference on {source}...")
         self.cap = cv2.VideoCapture(source)
-        self.model = YOLO(model_path)
         
-        # Define a Danger Zone (Interactive in real UI, hardcoded here)
-        # Top-left, Top-right, Bottom-right, Bottom-left
-        self.danger_zone = PolygonZone([(200, 200), (500, 200), (500, 400), (100, 400)], "High Voltage Area")
+        self.danger_zone = PolygonZone(DANGER_ZONE, DANGER_ZONE_NAME)
+
+        self.cascade = None
+        if cascade:
+            from cascade import CascadeDetector
+            self.cascade = CascadeDetector(person_model_path=person_model_path, ppe_model_path=model_path,
+                                           zones=[self.danger_zone])
+            self.model = self.cascade.ppe_model
+        else:
+            self.model = YOLO(model_path)
+
+        # Links helmets/vests to workers and smooths their status over ~0.5s
+        self.compliance = PPEComplianceMonitor(window=15)
+
+        # Decaying occupancy grid + zone dwell time, restored from the last snapshot
+        self.heatmap = OccupancyHeatmap(camera_id=camera_id, half_life_s=heatmap_half_life_s,
+                                        render_interval_s=heatmap_render_interval_s,
+                                        snapshot_interval_s=heatmap_snapshot_interval_s)
+
+    def warmup(self, imgsz=640):
+        """
+        Runs one inference on a blank frame so the first real frame
+        doesn't pay for lazy weight/CUDA initialization.
+        """
+        if self.cascade:
+            self.cascade.warmup()
+            return
+        dummy = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+        self.model.predict(dummy, verbose=False, imgsz=imgsz)
+
+    def detect(self, frame):
+        """
+        Returns detection rows [x1, y1, x2, y2, (track_id,) conf, cls] for one frame.
+        """
+        if self.cascade:
+            return self.cascade.detect(frame)
+
+        # Inference with TRACKING (ByteTrack)
+        # persist=True keeps IDs alive across frames
+        # tracker="bytetrack.yaml" is the state-of-the-art tracker in YOLOv8
+        results = self.model.track(frame, verbose=False, conf=0.25, persist=True, tracker="bytetrack.yaml")
+        rows = []
+        for result in results:
+            rows.extend(result.boxes.data.tolist())
+        return rows
 
     def process_stream(self):
         """
-        Yields (processed_frame, alert) tuples for UI consumption.
+        Yields (processed_frame, intrusion_alert, ppe_alerts, ppe_counts) tuples for UI consumption.
+        intrusion_alert is a str or None, ppe_alerts a list of per-worker messages,
+        ppe_counts is (compliant workers, workers in view).
         """
         frame_count = 0
         fps_start = time.time()
@@ -36,42 +95,55 @@ class NetraInferenceLoop:
             if not ret:
                 break
             
-            # 1. Inference with TRACKING (ByteTrack)
-            # persist=True keeps IDs alive across frames
-            # tracker="bytetrack.yaml" is the state-of-the-art tracker in YOLOv8
-            results = self.model.track(frame, verbose=False, conf=0.25, persist=True, tracker="bytetrack.yaml")
+            # 1. Inference (single model + ByteTrack, or person -> PPE cascade)
+            rows = self.detect(frame)
             
             # 2. Process Detections
             detections = []
-            for result in results:
-                # boxes with Track ID: [x1, y1, x2, y2, id, conf, cls] (sometimes id is missing if no track)
-                # We need to handle both cases
-                boxes = result.boxes.data.tolist()
-                
-                for box in boxes:
-                    # Check format length to handle cases where tracker hasn't assigned ID yet
-                    if len(box) == 7:
-                        x1, y1, x2, y2, track_id, conf, cls = box
-                    else:
-                        x1, y1, x2, y2, conf, cls = box
-                        track_id = -1
-
-                    # Normalize for polygon (it expects x1,y1,x2,y2,conf,cls)
-                    detections.append([x1, y1, x2, y2, conf, cls]) # Polygon doesn't care about ID yet
-                    
-                    # Visuals
-                    color = (0, 255, 0) # Green default
-                    label_text = f"#{int(track_id)} {self.model.names[int(cls)]}"
-
-                    
-                    # Logic: Violation Color Coding
-                    # Assuming Class 0=Helmet, 1=Vest, 3=No-Helmet, 4=No-Vest
-                    if int(cls) in [3, 4]: 
-                        color = (0, 0, 255) # Red for violation
-                        label_text = f"VIOLATION: {label_text}"
-
-                    cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), color, 2)
-                    cv2.putText(frame, label_text, (int(x1), int(y1)-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+            boxes, classes, track_ids = [], [], []
+            # boxes with Track ID: [x1, y1, x2, y2, id, conf, cls] (sometimes id is missing if no track)
+            # We need to handle both cases
+            for box in rows:
+                # Check format length to handle cases where tracker hasn't assigned ID yet
+                if len(box) == 7:
+                    x1, y1, x2, y2, track_id, conf, cls = box
+                else:
+                    x1, y1, x2, y2, conf, cls = box
+                    track_id = -1
+
+                # Normalize for polygon (it expects x1,y1,x2,y2,conf,cls)
+                detections.append([x1, y1, x2, y2, conf, cls]) # Polygon doesn't care about ID yet
+                boxes.append([x1, y1, x2, y2])
+                classes.append(cls)
+                track_ids.append(track_id)
+
+                # Visuals (equipment only, persons are drawn with their compliance status below)
+                if int(cls) == PERSON:
+                    continue
+                color = (0, 165, 255) if int(cls) in [NO_HELMET, NO_VEST] else (0, 255, 0)
+                cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), color, 1)
+
+            # Logic: Per-worker PPE compliance (helmet/vest linked to the person wearing it)
+            workers = self.compliance.update(boxes, classes, track_ids)
+            ppe_alerts = []
+            for worker in workers:
+                x1, y1, x2, y2 = worker["box"]
+                color = (0, 255, 0) # Green default
+                label_text = f"#{worker['track_id']} Person"
+
+                # Logic: Violation Color Coding
+                if worker["violations"]:
+                    color = (0, 0, 255) # Red for violation
+                    label_text = f"VIOLATION: {label_text} no {'/'.join(worker['violations'])}"
+                if worker["new"]:
+                    ppe_alerts.append(f"Worker #{worker['track_id']} has no {' / '.join(worker['new'])}")
+
+                cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), color, 2)
+                cv2.putText(frame, label_text, (int(x1), int(y1)-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+
+            # Workers with a known helmet AND vest status and no violation
+            ppe_counts = (self.compliance.compliant_count(workers), len(workers))
+            cv2.putText(frame, f"PPE OK: {ppe_counts[0]}/{ppe_counts[1]}", (20, 70), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
 
             # 3. Logic: Intrusion Detection
             alert_msg = None
@@ -82,16 +154,23 @@ class NetraInferenceLoop:
             else:
                 self.danger_zone.draw(frame, is_alert=False)
 
+            # Logic: Occupancy analytics (reuses the foot points trigger() just computed)
+            self.heatmap.update([self.danger_zone], frame.shape, keep=[int(d[5]) == PERSON for d in detections])
+
+            if ppe_alerts:
+                send_alert("PPE", "; ".join(ppe_alerts))
+
             # FPS Calculation
             frame_count += 1
             if frame_count % 10 == 0:
                 fps = frame_count / (time.time() - fps_start)
                 cv2.putText(frame, f"FPS: {fps:.1f}", (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2)
             
-            yield frame, alert_msg
+            yield frame, alert_msg, ppe_alerts, ppe_counts
     
     def release(self):
         self.cap.release()
+        self.heatmap.save()
 
 if __name__ == "__main__":
     # Use webcam 0 for demo
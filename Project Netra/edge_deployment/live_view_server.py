@@ -0,0 +1,298 @@
+import asyncio
+import base64
+import hashlib
+import json
+import struct
+import threading
+import time
+from urllib.parse import urlparse, parse_qs
+
+import cv2
+
+# Encode-once fan-out server for remote operators.
+#
+# The producer (VideoThread / inference loop) calls publish(frame) with every processed frame.
+# Each frame is JPEG-encoded once per quality level that currently has viewers, and the same
+# bytes are sent to every client of that level. Clients always get the newest frame: a slow
+# client simply skips frames instead of building up a buffer.
+#
+# Endpoints:
+#   /                      minimal viewer page
+#   /stream.mjpg?q=low     MJPEG (multipart/x-mixed-replace)
+#   /ws?q=high             WebSocket, one binary JPEG message per frame
+#   /stats                 JSON: per-client bandwidth, per-quality encode cost
+
+QUALITIES = {
+    # name: (jpeg quality, max width or None to keep the source size)
+    "high": (85, None),
+    "low": (50, 640),
+}
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"  # RFC 6455, section 1.3
+
+VIEWER_PAGE = b"""<!doctype html><html><head><title>Netra Live View</title></head>
+<body style="background:#111;color:#ccc;font-family:sans-serif">
+<h3>Netra Live View</h3><img src="/stream.mjpg?q=low" style="max-width:100%">
+</body></html>"""
+
+
+class _Client:
+    def __init__(self, kind, quality, peer):
+        self.kind = kind
+        self.quality = quality
+        self.peer = peer
+        self.connected_at = time.time()
+        self.bytes_sent = 0
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        self.last_seq = 0
+
+    def stats(self):
+        elapsed = max(time.time() - self.connected_at, 1e-6)
+        return {
+            "peer": self.peer, "kind": self.kind, "quality": self.quality,
+            "seconds": round(elapsed, 1),
+            "frames_sent": self.frames_sent, "frames_skipped": self.frames_skipped,
+            "kbps": round(self.bytes_sent * 8 / 1000 / elapsed, 1),
+        }
+
+
+class LiveViewServer:
+    """
+    Local HTTP server (MJPEG + WebSocket) running its own asyncio loop on a daemon thread.
+    """
+    def __init__(self, host="0.0.0.0", port=8080, qualities=None, send_timeout_s=5.0):
+        """
+        Args:
+            host (str): Interface to bind.
+            port (int): TCP port.
+            qualities (dict, optional): {name: (jpeg_quality, max_width)}, defaults to QUALITIES.
+            send_timeout_s (float): Clients that can't take a frame in this time are disconnected.
+        """
+        self.host = host
+        self.port = port
+        self.qualities = qualities or QUALITIES
+        self.send_timeout_s = send_timeout_s
+
+        self.loop = None
+        self.thread = None
+        self.server = None
+        self.new_frame = None  # asyncio.Condition, created on the server loop
+
+        # Latest raw frame from the producer, swapped as one tuple so seq and frame always match
+        self.latest = (0, None)
+        self.encoded = {q: (0, b"") for q in self.qualities}  # quality -> (seq, jpeg bytes)
+        self.encode_ms = {q: 0.0 for q in self.qualities}
+        self.encode_count = {q: 0 for q in self.qualities}
+        self.clients = set()
+        self._encoding = False
+
+    # --- Producer side (any thread) ---
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True, name="LiveViewServer")
+        self.thread.start()
+        print(f"📡 Live view server on http://{self.host}:{self.port}/")
+
+    def publish(self, frame):
+        """ Hands over the latest processed frame. Never blocks the caller. """
+        self.latest = (self.latest[0] + 1, frame)
+        if self.loop and self.clients:
+            self.loop.call_soon_threadsafe(self._schedule_encode)
+
+    def stop(self, timeout=5.0):
+        """ Disconnects all viewers and shuts the loop down cleanly. """
+        if self.loop and self.loop.is_running():
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop)
+        if self.thread:
+            self.thread.join(timeout)
+
+    # --- Server loop ---
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.new_frame = asyncio.Condition()
+        self.server = self.loop.run_until_complete(asyncio.start_server(self._handle, self.host, self.port))
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.run_until_complete(self.loop.shutdown_default_executor())
+            self.loop.close()
+
+    async def _shutdown(self):
+        # Stop accepting, then cancel client handlers (and any encode pass) and let their
+        # 'finally' blocks close the writers while the loop is still running
+        self.server.close()
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.server.wait_closed()
+        self.loop.stop()
+
+    def _schedule_encode(self):
+        # Only one encode pass in flight; frames published meanwhile are dropped, not queued
+        if not self._encoding:
+            self._encoding = True
+            self.loop.create_task(self._encode_latest())
+
+    async def _encode_latest(self):
+        try:
+            while True:
+                seq, frame = self.latest
+                if frame is None:
+                    break
+                wanted = {c.quality for c in self.clients}
+                for quality in wanted:
+                    if self.encoded[quality][0] == seq:
+                        continue
+                    # cv2.imencode releases the GIL, run it off the event loop
+                    data, ms = await self.loop.run_in_executor(None, self._encode, frame, quality)
+                    self.encoded[quality] = (seq, data)
+                    self.encode_ms[quality] += ms
+                    self.encode_count[quality] += 1
+                async with self.new_frame:
+                    self.new_frame.notify_all()
+                if self.latest[0] == seq or not self.clients:
+                    break
+        finally:
+            self._encoding = False
+
+    def _encode(self, frame, quality):
+        t0 = time.perf_counter()
+        jpeg_quality, max_width = self.qualities[quality]
+        if max_width and frame.shape[1] > max_width:
+            scale = max_width / frame.shape[1]
+            frame = cv2.resize(frame, (max_width, int(frame.shape[0] * scale)), interpolation=cv2.INTER_AREA)
+        ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+        return (buf.tobytes() if ok else b""), (time.perf_counter() - t0) * 1000
+
+    async def _next_frame(self, client):
+        """ Waits for a frame newer than the client's last one and returns the newest. """
+        async with self.new_frame:
+            await self.new_frame.wait_for(lambda: self.encoded[client.quality][0] > client.last_seq)
+        seq, data = self.encoded[client.quality]
+        if client.last_seq:
+            client.frames_skipped += seq - client.last_seq - 1
+        client.last_seq = seq
+        return data
+
+    async def _handle(self, reader, writer):
+        peer = "%s:%s" % (writer.get_extra_info("peername") or ("?", 0))[:2]
+        try:
+            request_line = (await reader.readline()).decode("latin-1").strip()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                key, _, value = line.partition(":")
+                headers[key.strip().lower()] = value.strip()
+
+            parts = request_line.split()
+            url = urlparse(parts[1] if len(parts) > 1 else "/")
+            quality = parse_qs(url.query).get("q", [""])[0]
+            if quality not in self.qualities:
+                quality = list(self.qualities)[-1]  # Lowest level by default
+
+            if url.path == "/stream.mjpg":
+                await self._serve_mjpeg(writer, _Client("mjpeg", quality, peer))
+            elif url.path == "/ws" and "websocket" in headers.get("upgrade", "").lower():
+                await self._serve_ws(reader, writer, headers, _Client("ws", quality, peer))
+            elif url.path == "/stats":
+                self._respond(writer, "application/json", json.dumps(self.stats(), indent=2).encode())
+            elif url.path == "/":
+                self._respond(writer, "text/html", VIEWER_PAGE)
+            else:
+                self._respond(writer, "text/plain", b"Not found", status="404 Not Found")
+            await writer.drain()
+        except (ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # Server shutdown: end quietly, asyncio's stream callback doesn't expect a cancelled task
+            pass
+        finally:
+            writer.close()
+
+    def _respond(self, writer, content_type, body, status="200 OK"):
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+
+    async def _stream(self, writer, client, wrap):
+        self.clients.add(client)
+        self._schedule_encode()
+        try:
+            while True:
+                payload = wrap(await self._next_frame(client))
+                writer.write(payload)
+                await asyncio.wait_for(writer.drain(), self.send_timeout_s)
+                client.bytes_sent += len(payload)
+                client.frames_sent += 1
+        finally:
+            self.clients.discard(client)
+
+    async def _serve_mjpeg(self, writer, client):
+        writer.write(b"HTTP/1.1 200 OK\r\nCache-Control: no-cache\r\nConnection: close\r\n"
+                     b"Content-Type: multipart/x-mixed-replace; boundary=frame\r\n\r\n")
+        await self._stream(writer, client, lambda jpg: (
+            b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n" % len(jpg) + jpg + b"\r\n"))
+
+    async def _serve_ws(self, reader, writer, headers, client):
+        accept = base64.b64encode(hashlib.sha1((headers.get("sec-websocket-key", "") + WS_GUID).encode()).digest())
+        writer.write(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                     b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n")
+
+        # Viewers only send control frames: answer ping, echo close, then hang up
+        closed = asyncio.ensure_future(self._ws_control(reader, writer))
+        sender = asyncio.ensure_future(self._stream(writer, client, self._ws_frame))
+        try:
+            await asyncio.wait({closed, sender}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            closed.cancel()
+            sender.cancel()
+        for task in (closed, sender):
+            if task.done() and not task.cancelled():
+                task.exception()  # EOF or dropped/slow client, already cleaned up
+
+    async def _ws_control(self, reader, writer):
+        """ Reads client frames until a close frame or EOF, replying to ping and close. """
+        while True:
+            head = await reader.readexactly(2)
+            opcode, n = head[0] & 0x0F, head[1] & 0x7F
+            if n == 126:
+                n = struct.unpack("!H", await reader.readexactly(2))[0]
+            elif n == 127:
+                n = struct.unpack("!Q", await reader.readexactly(8))[0]
+            if n > 1 << 16:
+                return  # Viewers have no reason to send large messages, just hang up
+            mask = await reader.readexactly(4) if head[1] & 0x80 else b"\0\0\0\0"
+            payload = bytes(b ^ mask[i % 4] for i, b in enumerate(await reader.readexactly(n)))
+
+            if opcode == 0x8:  # Close: echo the status code back, the stream ends here
+                writer.write(self._ws_frame(payload[:2], opcode=0x8))
+                return
+            if opcode == 0x9:  # Ping -> pong with the same payload
+                writer.write(self._ws_frame(payload, opcode=0xA))
+
+    @staticmethod
+    def _ws_frame(payload, opcode=0x2):
+        # Single unmasked frame (server -> client), binary by default
+        first, n = 0x80 | opcode, len(payload)
+        if n < 126:
+            header = struct.pack("!BB", first, n)
+        elif n < 1 << 16:
+            header = struct.pack("!BBH", first, 126, n)
+        else:
+            header = struct.pack("!BBQ", first, 127, n)
+        return header + payload
+
+    def stats(self):
+        """ Per-client bandwidth and per-quality encode cost. """
+        return {
+            "frames_published": self.latest[0],
+            "encode": {q: {"frames": self.encode_count[q],
+                           "avg_ms": round(self.encode_ms[q] / max(self.encode_count[q], 1), 2)}
+                       for q in self.qualities},
+            "clients": [c.stats() for c in list(self.clients)],
+        }
@@ -0,0 +1,159 @@
+import os
+import time
+
+import cv2
+import numpy as np
+
+
+class OccupancyHeatmap:
+    """
+    Exponentially decaying occupancy grid for one camera, plus per-zone dwell counters.
+
+    Decay is applied lazily: instead of multiplying the whole grid every frame,
+    new hits are added with weight exp(+t / tau) relative to a reference time,
+    and the grid is only rescaled when it is rendered or snapshotted.
+    Per-frame cost is O(detections).
+    """
+    def __init__(self, camera_id="cam0", grid_size=(48, 64), half_life_s=300.0,
+                 render_interval_s=1.0, snapshot_dir="heatmaps", snapshot_interval_s=60.0):
+        """
+        Args:
+            camera_id (str): Used to name the snapshot file.
+            grid_size (tuple): (rows, cols) of the occupancy grid, independent of frame size.
+            half_life_s (float): Time for an old hit to lose half its weight.
+            render_interval_s (float): Minimum time between two colourized overlays.
+            snapshot_dir (str): Where snapshots are persisted, None to disable.
+            snapshot_interval_s (float): Time between two snapshots.
+        """
+        self.camera_id = camera_id
+        self.grid = np.zeros(grid_size, np.float64)
+        self.tau = half_life_s / np.log(2)
+        self.t_ref = time.time()  # grid values are expressed relative to this time
+
+        self.render_interval_s = render_interval_s
+        self.last_render = 0.0
+        self.overlay = None
+
+        self.snapshot_path = None
+        if snapshot_dir:
+            self.snapshot_path = os.path.join(snapshot_dir, f"heatmap_{camera_id}.npz")
+        self.snapshot_interval_s = snapshot_interval_s
+        self.last_snapshot = time.time()
+
+        self.dwell = {}  # zone name -> {"occupied_s", "person_s", "count"}
+        self.last_update = None
+
+        self.load()
+
+    def update(self, zones, frame_shape, keep=None, t=None):
+        """
+        Accumulates the foot points computed by the last `trigger()` call of each zone.
+        Call once per frame with every zone: the grid gets each person once and all
+        dwell counters advance by the same frame time.
+        Args:
+            zones (list of PolygonZone): Zones that have just been triggered on the same detections.
+            frame_shape (tuple): (height, width, ...) of the frame the points live in.
+            keep (list of bool, optional): Which detections to count (e.g. persons only).
+            t (float, optional): Timestamp, defaults to now.
+        """
+        t = time.time() if t is None else t
+        dt = 0.0 if self.last_update is None else min(t - self.last_update, 1.0)
+        self.last_update = t
+
+        # Rebase on elapsed time, before any weight is computed, so exp() can't overflow
+        # even after days without detections (rare, full-grid work)
+        if (t - self.t_ref) / self.tau > 20:
+            self._rebase(t)
+
+        points = []
+        for zone in zones:
+            points = zone.foot_points
+            if keep is not None:
+                points = [p for p, k in zip(points, keep) if k]
+
+            inside = sum(1 for p in points if p[2])
+            stats = self.dwell.setdefault(zone.name, {"occupied_s": 0.0, "person_s": 0.0, "count": 0})
+            stats["count"] = inside
+            if inside:
+                stats["occupied_s"] += dt
+                stats["person_s"] += inside * dt
+
+        # Foot positions don't depend on the zone, the last zone's points stand for all of them
+        self._accumulate(points, frame_shape, t)
+
+        if self.snapshot_path and t - self.last_snapshot >= self.snapshot_interval_s:
+            self.save(t)
+
+    def _accumulate(self, points, frame_shape, t):
+        if not points:
+            return
+        rows, cols = self.grid.shape
+        h, w = frame_shape[:2]
+        pts = np.asarray([p[:2] for p in points], np.float64)
+        r = np.clip((pts[:, 1] * rows / h).astype(int), 0, rows - 1)
+        c = np.clip((pts[:, 0] * cols / w).astype(int), 0, cols - 1)
+        np.add.at(self.grid, (r, c), np.exp((t - self.t_ref) / self.tau))
+
+    def _rebase(self, t):
+        self.grid *= np.exp(-(t - self.t_ref) / self.tau)
+        self.t_ref = t
+
+    def values(self, t=None):
+        """ Decayed occupancy grid at time t. """
+        t = time.time() if t is None else t
+        return self.grid * np.exp(-(t - self.t_ref) / self.tau)
+
+    def overlay_if_due(self, size=(320, 240), t=None):
+        """
+        Returns a colourized BGR heatmap of `size` (w, h) at most once per
+        `render_interval_s`, None otherwise.
+        """
+        t = time.time() if t is None else t
+        if t - self.last_render < self.render_interval_s:
+            return None
+        self.last_render = t
+
+        grid = self.values(t)
+        peak = grid.max()
+        norm = (grid / peak * 255).astype(np.uint8) if peak > 0 else np.zeros(grid.shape, np.uint8)
+        norm = cv2.resize(norm, size, interpolation=cv2.INTER_LINEAR)
+        self.overlay = cv2.applyColorMap(norm, cv2.COLORMAP_JET)
+        return self.overlay
+
+    def summary(self):
+        """ One line per zone: current count and accumulated dwell time. """
+        return "  |  ".join(
+            f"{name}: {s['count']} now, occupied {s['occupied_s'] / 60:.1f} min, "
+            f"{s['person_s'] / 60:.1f} person-min"
+            for name, s in self.dwell.items())
+
+    def save(self, t=None):
+        """ Persists the grid and dwell counters (write-then-rename). """
+        t = time.time() if t is None else t
+        self.last_snapshot = t
+        if not self.snapshot_path:
+            return
+        os.makedirs(os.path.dirname(self.snapshot_path) or ".", exist_ok=True)
+        names = list(self.dwell)
+        tmp = self.snapshot_path + ".tmp.npz"
+        np.savez(tmp, grid=self.values(t), saved_at=t,
+                 zone_names=np.array(names, dtype=str),
+                 dwell=np.array([[self.dwell[n]["occupied_s"], self.dwell[n]["person_s"]] for n in names]).reshape(-1, 2))
+        os.replace(tmp, self.snapshot_path)
+
+    def load(self):
+        """ Restores the last snapshot, decayed by the time the app was down. """
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            snap = np.load(self.snapshot_path)
+            if snap["grid"].shape != self.grid.shape:
+                print(f"⚠️  Heatmap snapshot grid {snap['grid'].shape} doesn't match {self.grid.shape}, ignoring.")
+                return
+            # Stored grid is the decayed value at 'saved_at', re-express it relative to t_ref
+            self.grid = snap["grid"] * np.exp(-(self.t_ref - float(snap["saved_at"])) / self.tau)
+            for name, (occupied_s, person_s) in zip(snap["zone_names"], snap["dwell"]):
+                self.dwell[str(name)] = {"occupied_s": float(occupied_s), "person_s": float(person_s), "count": 0}
+            print(f"Restored heatmap snapshot for {self.camera_id}")
+        except Exception as e:
+            print(f"⚠️  Could not load heatmap snapshot: {e}")
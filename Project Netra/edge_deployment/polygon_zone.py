@@ -16,6 +16,9 @@ class PolygonZone:
         self.name = name
         self.color = (0, 0, 255) # Red for intrusion
 
+        # Foot points of the last trigger() call, reused by occupancy analytics
+        self.foot_points = []  # [(x, y, is_inside), ...] in detection order
+
     def trigger(self, detections):
         """
         Checks if any detections are inside the polygon.
@@ -25,6 +28,7 @@ class PolygonZone:
             list: List of detections that are INSIDE the zone.
         """
         prohibited_objects = []
+        self.foot_points = []
         for det in detections:
             x1, y1, x2, y2 = det[:4]
             # Calculate center point of the object base (better for 'standing in zone')
@@ -34,6 +38,7 @@ class PolygonZone:
             # Check point in polygon
             # measureDist=False returns +1 (inside), -1 (outside), 0 (edge)
             is_inside = cv2.pointPolygonTest(self.polygon, (center_x, center_y), False)
+            self.foot_points.append((center_x, center_y, is_inside >= 0))
             
             if is_inside >= 0:
                 prohibited_objects.append(det)
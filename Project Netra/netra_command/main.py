@@ -1,7 +1,11 @@
+import time
+APP_START = time.perf_counter() # Taken before any heavy import, for startup timing
+
 import sys
 import os
+import argparse
 from PyQt6.QtWidgets import QApplication, QMainWindow, QWidget, QHBoxLayout, QVBoxLayout, QLabel, QFrame
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer
 from ui.dashboard import DashboardWidget
 
 def load_stylesheet():
@@ -12,21 +16,41 @@ def load_stylesheet():
     return ""
 
 class NetraMainWindow(QMainWindow):
-    def __init__(self):
+    def __init__(self, t_start=None, live_port=None, cascade=False, heatmap_interval_s=1.0):
         super().__init__()
         self.setWindowTitle("Netra Command Center")
         self.resize(1600, 900)
         
-        # Central Dashboard
-        self.dashboard = DashboardWidget()
+        # Central Dashboard (engine loads in the background, see VideoThread)
+        self.dashboard = DashboardWidget(t_start=t_start, live_port=live_port, cascade=cascade,
+                                         heatmap_interval_s=heatmap_interval_s)
         self.setCentralWidget(self.dashboard)
 
+    def closeEvent(self, event):
+        self.dashboard.shutdown()
+        event.accept()
+
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--live-port', type=int, default=None, help='Serve the annotated feed over HTTP (MJPEG/WebSocket) on this port')
+    parser.add_argument('--cascade', action='store_true', help='Person detector + PPE model on crops (faster on CPU)')
+    parser.add_argument('--heatmap-interval', type=float, default=1.0, help='Seconds between two occupancy heatmap refreshes')
+    args, qt_args = parser.parse_known_args()
+
+    app = QApplication(sys.argv[:1] + qt_args)
     
     # Load Theme
     app.setStyleSheet(load_stylesheet())
     
-    window = NetraMainWindow()
+    window = NetraMainWindow(t_start=APP_START, live_port=args.live_port, cascade=args.cascade,
+                             heatmap_interval_s=args.heatmap_interval)
     window.show()
+
+    def report_startup():
+        startup = time.perf_counter() - APP_START
+        print(f"⏱️  Time to window: {startup:.2f}s")
+        window.dashboard.add_alert("UI READY", f"Time to window: {startup:.2f}s")
+
+    # Fires once the event loop is running, i.e. after the window has been shown
+    QTimer.singleShot(0, report_startup)
     sys.exit(app.exec())
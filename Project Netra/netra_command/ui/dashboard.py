@@ -3,6 +3,7 @@ from PyQt6.QtCore import Qt, QTimer, pyqtSignal, QThread
 from PyQt6.QtGui import QImage, QPixmap
 import cv2
 import datetime
+import time
 import numpy as np
 
 # Import the Inference Loop
@@ -13,43 +14,102 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../e
 # Add project root as well for good measure
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 
-from inference_loop import NetraInferenceLoop
+from live_view_server import LiveViewServer
+
+# NOTE: 'inference_loop' (and with it ultralytics/torch) is imported lazily
+# inside VideoThread.init_engine so the window can show before the model is loaded.
+
+# Training runs (train_yolo.py / train_cascade.py) write to '<Project Netra>/Netra_Vision_Core'
+WEIGHTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "Netra_Vision_Core"))
 
 class VideoThread(QThread):
     change_pixmap_signal = pyqtSignal(np.ndarray)
     alert_signal = pyqtSignal(str, str) # title, message
+    status_signal = pyqtSignal(str) # startup progress
+    ready_signal = pyqtSignal(float) # seconds spent initializing the engine
+    heatmap_signal = pyqtSignal(np.ndarray, str) # heatmap image, zone dwell summary
+    compliance_signal = pyqtSignal(int, int) # compliant workers, workers in view
 
-    def __init__(self):
+    def __init__(self, live_server=None, cascade=False, heatmap_interval_s=1.0):
         super().__init__()
         self._run_flag = True
-        
-        # Initialize Logic Engine
+        self.netra_engine = None
+        self.live_server = live_server # Optional fan-out to remote viewers
+        self.cascade = cascade # Person detector -> PPE model on crops (faster on CPU)
+        self.heatmap_interval_s = heatmap_interval_s
+
+    def init_engine(self):
+        """
+        Heavy initialization, runs on the worker thread:
+        imports, camera + model loading and a warm-up inference.
+        """
+        t0 = time.perf_counter()
+
+        self.status_signal.emit("Loading inference libraries...")
+        from inference_loop import NetraInferenceLoop
+
         # We try to use the exported model if available, else standard yolo
         model_path = 'yolov8m.pt' 
         # Check for trained weight
-        trained_weight = r"..\vision_core\Netra_Vision_Core\v1_meta_enhanced\weights\best.pt"
+        trained_weight = os.path.join(WEIGHTS_DIR, "v1_meta_enhanced", "weights", "best.pt")
         if os.path.exists(trained_weight):
              model_path = trained_weight
 
+        if self.cascade:
+            # Stage 2 needs data.yaml classes: the crop model from vision_core/train_cascade.py,
+            # else the full-frame trained model (same class IDs, works on crops too).
+            # Never a COCO checkpoint, its class IDs mean something else entirely.
+            cascade_weight = os.path.join(WEIGHTS_DIR, "ppe_cascade", "weights", "best.pt")
+            if os.path.exists(cascade_weight):
+                model_path = cascade_weight
+            elif not os.path.exists(trained_weight):
+                raise FileNotFoundError(
+                    f"Cascade mode needs a PPE model trained on data.yaml classes in {WEIGHTS_DIR}. "
+                    "Run 'python vision_core/train_cascade.py' (or train_yolo.py) first.")
+
+        self.status_signal.emit(f"Loading model {os.path.basename(model_path)}...")
+        engine = NetraInferenceLoop(source=0, model_path=model_path, cascade=self.cascade,
+                                    heatmap_render_interval_s=self.heatmap_interval_s)
+
+        # First inference pays for CUDA context / kernel selection, do it on a dummy frame
+        self.status_signal.emit("Warming up model...")
+        engine.warmup()
+
+        self.ready_signal.emit(time.perf_counter() - t0)
+        return engine
+
+    def run(self):
         try:
-            self.netra_engine = NetraInferenceLoop(source=0, model_path=model_path)
+            self.netra_engine = self.init_engine()
         except Exception as e:
             print(f"Failed to init engine: {e}")
-            self.netra_engine = None
+            self.status_signal.emit(f"Engine failed to start: {e}")
+            return
 
-    def run(self):
-        if not self.netra_engine:
+        if not self._run_flag:
+            # Window was closed while we were still loading
+            self.netra_engine.release()
             return
 
         # Generator loop
-        for frame, alert in self.netra_engine.process_stream():
+        for frame, alert, ppe_alerts, ppe_counts in self.netra_engine.process_stream():
             if not self._run_flag:
                 break
                 
             self.change_pixmap_signal.emit(frame)
+            self.compliance_signal.emit(*ppe_counts)
+            if self.live_server:
+                self.live_server.publish(frame)
+
+            # Heatmap is only re-rendered once per heatmap_render_interval_s (1s by default)
+            heatmap = self.netra_engine.heatmap.overlay_if_due(size=(240, 135))
+            if heatmap is not None:
+                self.heatmap_signal.emit(heatmap, self.netra_engine.heatmap.summary())
             
             if alert:
                 self.alert_signal.emit("INTRUSION DETECTED", alert)
+            for msg in ppe_alerts:
+                self.alert_signal.emit("PPE VIOLATION", msg)
             
             self.msleep(1) # Yield to QT
 
@@ -60,8 +120,20 @@ class VideoThread(QThread):
         self.wait()
 
 class DashboardWidget(QWidget):
-    def __init__(self):
+    def __init__(self, t_start=None, live_port=None, cascade=False, heatmap_interval_s=1.0):
+        """
+        Args:
+            t_start (float, optional): time.perf_counter() at app launch, used for startup timing.
+            live_port (int, optional): Serve the annotated feed to remote viewers on this port.
+            cascade (bool): Use the two-stage person -> PPE cascade.
+            heatmap_interval_s (float): Seconds between two heatmap refreshes in the bottom strip.
+        """
         super().__init__()
+        self.t_start = t_start if t_start is not None else time.perf_counter()
+        self.live_port = live_port
+        self.cascade = cascade
+        self.heatmap_interval_s = heatmap_interval_s
+        self.first_frame_shown = False
         self.initUI()
         self.start_video_feed()
 
@@ -93,7 +165,8 @@ class DashboardWidget(QWidget):
         center_layout = QVBoxLayout()
         self.center_panel.setLayout(center_layout)
         
-        self.video_label = QLabel()
+        self.video_label = QLabel("Starting Netra engine...")
+        self.video_label.setStyleSheet("color: #888; font-size: 16px;")
         self.video_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         center_layout.addWidget(self.video_label)
         
@@ -102,6 +175,13 @@ class DashboardWidget(QWidget):
         self.lbl_zone_status = QLabel("ZONE STATUS: SECURE")
         self.lbl_zone_status.setStyleSheet("color: #32CD32; font-weight: bold; font-size: 16px;")
         stat_strip.addWidget(self.lbl_zone_status)
+        self.lbl_dwell = QLabel("")
+        self.lbl_dwell.setStyleSheet("color: #888; font-size: 12px;")
+        self.lbl_dwell.setWordWrap(True)
+        stat_strip.addWidget(self.lbl_dwell, stretch=1)
+        self.heatmap_label = QLabel()
+        self.heatmap_label.setFixedSize(240, 135)
+        stat_strip.addWidget(self.heatmap_label)
         center_layout.addLayout(stat_strip)
         
         main_layout.addWidget(self.center_panel, stretch=1)
@@ -122,6 +202,7 @@ class DashboardWidget(QWidget):
         self.add_stat(right_layout, "FPS", "30.1")
         self.add_stat(right_layout, "LATENCY", "15ms")
         self.add_stat(right_layout, "ACTIVE ZONES", "3")
+        self.lbl_compliant = self.add_stat(right_layout, "PPE COMPLIANT", "-")
         
         right_layout.addStretch()
         
@@ -140,25 +221,60 @@ class DashboardWidget(QWidget):
         vbox.addWidget(lbl_title)
         vbox.addWidget(lbl_val)
         layout.addWidget(container)
+        return lbl_val
 
     def start_video_feed(self):
-        self.thread = VideoThread()
+        self.live_server = None
+        if self.live_port:
+            self.live_server = LiveViewServer(port=self.live_port)
+            self.live_server.start()
+
+        self.thread = VideoThread(live_server=self.live_server, cascade=self.cascade,
+                                  heatmap_interval_s=self.heatmap_interval_s)
         self.thread.change_pixmap_signal.connect(self.update_image)
         self.thread.alert_signal.connect(self.add_alert)
+        self.thread.status_signal.connect(self.update_status)
+        self.thread.ready_signal.connect(self.engine_ready)
+        self.thread.heatmap_signal.connect(self.update_heatmap)
+        self.thread.compliance_signal.connect(self.update_compliance)
         self.thread.start()
 
+    def update_status(self, msg):
+        """Shows engine startup progress in place of the video feed"""
+        if not self.first_frame_shown:
+            self.video_label.setText(msg)
+
+    def engine_ready(self, init_seconds):
+        self.add_alert("ENGINE READY", f"Model loaded and warmed up in {init_seconds:.1f}s")
+
     def update_image(self, cv_img):
         """Updates the video_label with a new opencv image"""
         qt_img = self.convert_cv_qt(cv_img)
         self.video_label.setPixmap(qt_img)
 
-    def convert_cv_qt(self, cv_img):
+        if not self.first_frame_shown:
+            self.first_frame_shown = True
+            elapsed = time.perf_counter() - self.t_start
+            print(f"⏱️  Time to first annotated frame: {elapsed:.2f}s")
+            self.add_alert("FIRST FRAME", f"Time to first annotated frame: {elapsed:.2f}s")
+
+    def update_heatmap(self, heatmap_img, summary):
+        """Updates the occupancy heatmap thumbnail and dwell stats in the bottom strip"""
+        self.heatmap_label.setPixmap(self.convert_cv_qt(heatmap_img, self.heatmap_label))
+        self.lbl_dwell.setText(summary)
+
+    def update_compliance(self, compliant, total):
+        """Shows how many workers in view wear both helmet and vest"""
+        self.lbl_compliant.setText(f"{compliant} / {total}")
+
+    def convert_cv_qt(self, cv_img, target=None):
         """Convert from an opencv image to QPixmap"""
+        target = target or self.video_label
         rgb_image = cv2.cvtColor(cv_img, cv2.COLOR_BGR2RGB)
         h, w, ch = rgb_image.shape
         bytes_per_line = ch * w
         convert_to_Qt_format = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format.Format_RGB888)
-        p = convert_to_Qt_format.scaled(self.video_label.width(), self.video_label.height(), Qt.AspectRatioMode.KeepAspectRatio)
+        p = convert_to_Qt_format.scaled(target.width(), target.height(), Qt.AspectRatioMode.KeepAspectRatio)
         return QPixmap.fromImage(p)
 
     def add_alert(self, title, msg):
@@ -167,6 +283,11 @@ class DashboardWidget(QWidget):
         self.event_list.insertItem(0, item)
         # Flash effect or sound could go here
         
-    def closeEvent(self, event):
+    def shutdown(self):
+        """
+        Stops the engine (which saves the final heatmap snapshot) and the live view server.
+        Called by the main window: Qt only sends closeEvent to top-level windows.
+        """
         self.thread.stop()
-        event.accept()
+        if self.live_server:
+            self.live_server.stop()
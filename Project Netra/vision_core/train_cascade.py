@@ -0,0 +1,177 @@
+from ultralytics import YOLO
+import argparse
+import glob
+import os
+
+import cv2
+import yaml
+
+from train_yolo import check_gpu
+
+# Stage 2 of the edge cascade (edge_deployment/cascade.py): a compact PPE detector that
+# only ever sees person crops. The crop dataset is derived from the existing YOLO dataset
+# so it keeps the data.yaml class IDs, and the crops are padded the same way as at inference.
+
+PERSON = 2
+# Absolute, so the weights land where the dashboard looks for them whatever the working directory
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "Netra_Vision_Core"))
+IMG_EXTS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def resolve_root(data_cfg, yaml_path):
+    root = data_cfg.get('path', '.')
+    if os.path.isabs(root):
+        return root
+    # Try relative to the yaml first (as written in data.yaml), then to the working directory
+    candidate = os.path.normpath(os.path.join(os.path.dirname(yaml_path), root))
+    return candidate if os.path.exists(candidate) else os.path.abspath(root)
+
+
+def label_path_for(image_path):
+    # YOLO convention: .../images/... -> .../labels/..., same stem, .txt
+    marker = os.sep + "images" + os.sep
+    if marker not in image_path:
+        return os.path.splitext(image_path)[0] + ".txt"
+    head, tail = image_path.rsplit(marker, 1)
+    return os.path.join(head, "labels", os.path.splitext(tail)[0] + ".txt")
+
+
+def read_labels(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [[float(v) for v in line.split()] for line in f if line.strip()]
+
+
+def crop_split(image_dir, out_dir, pad, min_size):
+    """
+    Writes one padded crop per labelled Person with its PPE labels re-normalized to the crop.
+    Returns the number of crops written.
+    """
+    os.makedirs(os.path.join(out_dir, "images"), exist_ok=True)
+    os.makedirs(os.path.join(out_dir, "labels"), exist_ok=True)
+
+    count = 0
+    images = [p for p in glob.glob(os.path.join(image_dir, "**", "*"), recursive=True)
+              if p.lower().endswith(IMG_EXTS)]
+    for image_path in images:
+        labels = read_labels(label_path_for(image_path))
+        persons = [l for l in labels if int(l[0]) == PERSON]
+        if not persons:
+            continue
+        img = cv2.imread(image_path)
+        if img is None:
+            continue
+        h, w = img.shape[:2]
+        items = [l for l in labels if int(l[0]) != PERSON]
+
+        for i, (_, pcx, pcy, pw, ph) in enumerate(persons):
+            # Same padding as CascadeDetector.crop_pad so train and inference crops match
+            x1 = max(0, int((pcx - pw / 2 - pw * pad) * w))
+            y1 = max(0, int((pcy - ph / 2 - ph * pad) * h))
+            x2 = min(w, int((pcx + pw / 2 + pw * pad) * w))
+            y2 = min(h, int((pcy + ph / 2 + ph * pad) * h))
+            cw, ch = x2 - x1, y2 - y1
+            if cw < min_size or ch < min_size:
+                continue
+
+            crop_labels = []
+            for cls, cx, cy, bw, bh in items:
+                # Keep items whose centre falls in the crop, clipped to its borders
+                if not (x1 <= cx * w < x2 and y1 <= cy * h < y2):
+                    continue
+                bx1 = max(x1, (cx - bw / 2) * w)
+                by1 = max(y1, (cy - bh / 2) * h)
+                bx2 = min(x2, (cx + bw / 2) * w)
+                by2 = min(y2, (cy + bh / 2) * h)
+                crop_labels.append(f"{int(cls)} {((bx1 + bx2) / 2 - x1) / cw:.6f} {((by1 + by2) / 2 - y1) / ch:.6f} "
+                                   f"{(bx2 - bx1) / cw:.6f} {(by2 - by1) / ch:.6f}")
+
+            stem = f"{os.path.splitext(os.path.basename(image_path))[0]}_p{i}"
+            cv2.imwrite(os.path.join(out_dir, "images", stem + ".jpg"), img[y1:y2, x1:x2])
+            with open(os.path.join(out_dir, "labels", stem + ".txt"), "w") as f:
+                f.write("\n".join(crop_labels) + ("\n" if crop_labels else ""))
+            count += 1
+    return count
+
+
+def build_crop_dataset(data_yaml, out_root, pad=0.15, min_size=16):
+    """
+    Derives the person-crop dataset from `data_yaml` and writes its own yaml
+    with the same class names. Returns the path to the new yaml.
+    """
+    with open(data_yaml) as f:
+        data_cfg = yaml.safe_load(f)
+    root = resolve_root(data_cfg, data_yaml)
+
+    total = 0
+    for split in ("train", "val"):
+        if not data_cfg.get(split):
+            continue
+        n = crop_split(os.path.join(root, data_cfg[split]), os.path.join(out_root, split), pad, min_size)
+        print(f"  {split}: {n} person crops")
+        total += n
+    if total == 0:
+        raise ValueError(f"No 'Person' (class {PERSON}) labels found under {root}. "
+                         "The cascade's second stage is trained on person crops.")
+
+    crop_yaml = os.path.join(out_root, "ppe_crops.yaml")
+    with open(crop_yaml, "w") as f:
+        yaml.dump({
+            'path': os.path.abspath(out_root),
+            'train': 'train/images',
+            'val': 'val/images',
+            'names': data_cfg['names'],
+        }, f, default_flow_style=False)
+    return crop_yaml
+
+
+def train_cascade(data_yaml, out_root, imgsz=256, epochs=100, pad=0.15, export=True):
+    print("=" * 60)
+    print("🚀 Project Netra: Cascade Stage 2 (PPE on person crops)")
+    print("=" * 60)
+
+    device = check_gpu()
+
+    print(f"\n[1/3] Building person-crop dataset from {data_yaml}...")
+    crop_yaml = build_crop_dataset(data_yaml, out_root, pad=pad)
+
+    # Nano model: stage 2 only sees small crops, so capacity is not the bottleneck
+    print("\n[2/3] Training YOLOv8-Nano on crops...")
+    model = YOLO('yolov8n.pt')
+    model.train(
+        data=crop_yaml,
+        epochs=epochs,
+        imgsz=imgsz,
+        batch=64,
+        device=device,
+        project=PROJECT_DIR,
+        name='ppe_cascade',
+        exist_ok=True,
+        optimizer='AdamW',
+        lr0=0.001,
+        cos_lr=True,
+        mosaic=0.0,  # Mosaic would glue several workers into one 'crop'
+        fliplr=0.5,
+        hsv_v=0.4,
+    )
+    print(f"✅ Training Complete. Best model saved in '{os.path.join(PROJECT_DIR, 'ppe_cascade', 'weights', 'best.pt')}'")
+
+    if export:
+        # dynamic=True: the number of crops per frame varies
+        print("\n[3/3] Exporting to ONNX...")
+        path = model.export(format='onnx', dynamic=True, opset=12, imgsz=imgsz)
+        print(f"💾 ONNX Model saved at: {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--config', type=str, default=os.path.join("data", "data.yaml"), help='Source dataset yaml (data.yaml classes)')
+    parser.add_argument('--out', type=str, default=os.path.join("datasets", "ppe_crops"), help='Where to write the crop dataset')
+    parser.add_argument('--imgsz', type=int, default=256, help='Crop input size (match CascadeDetector.ppe_imgsz)')
+    parser.add_argument('--epochs', type=int, default=100)
+    parser.add_argument('--pad', type=float, default=0.15, help='Crop padding (match CascadeDetector.crop_pad)')
+    parser.add_argument('--no-export', action='store_true', help='Skip ONNX export')
+    args = parser.parse_args()
+
+    train_cascade(args.config, args.out, imgsz=args.imgsz, epochs=args.epochs, pad=args.pad, export=not args.no_export)